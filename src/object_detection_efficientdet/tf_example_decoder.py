@@ -27,11 +27,52 @@ protos for object detection.
 
 import tensorflow as tf
 
+# num_buckets is an attribute of the hash op (not a tensor input), so the
+# right hoist is a Python-level constant evaluated once at import.
+_SOURCE_ID_HASH_BUCKETS = 2**63 - 1
 
-def _get_source_id_from_encoded_image(parsed_tensors):
-    return tf.strings.as_string(
-        tf.strings.to_hash_bucket_fast(parsed_tensors["image/encoded"], 2**63 - 1)
-    )
+
+def _get_source_id_from_encoded_image(encoded_image):
+    """Returns the raw int64 hash of the encoded image bytes.
+
+    Callers format the hash to a decimal string where one is required
+    (downstream code parses source_id with tf.strings.to_number); keeping the
+    formatter out of the helper lets batched callers run as_string once per
+    batch instead of per example.
+    """
+    return tf.strings.to_hash_bucket_fast(encoded_image, _SOURCE_ID_HASH_BUCKETS)
+
+
+_BASE_KEYS_TO_FEATURES = {
+    "image/encoded": tf.io.FixedLenFeature((), tf.string),
+    "image/source_id": tf.io.FixedLenFeature((), tf.string, ""),
+    "image/height": tf.io.FixedLenFeature((), tf.int64, -1),
+    "image/width": tf.io.FixedLenFeature((), tf.int64, -1),
+    "image/object/bbox/xmin": tf.io.RaggedFeature(tf.float32),
+    "image/object/bbox/xmax": tf.io.RaggedFeature(tf.float32),
+    "image/object/bbox/ymin": tf.io.RaggedFeature(tf.float32),
+    "image/object/bbox/ymax": tf.io.RaggedFeature(tf.float32),
+    "image/object/class/label": tf.io.RaggedFeature(tf.int64),
+    "image/object/area": tf.io.RaggedFeature(tf.float32),
+    "image/object/is_crowd": tf.io.RaggedFeature(tf.int64),
+}
+_MASK_FEATURES = {
+    "image/object/mask": tf.io.RaggedFeature(tf.string),
+}
+_PSEUDO_SCORE_FEATURES = {
+    "image/object/pseudo_score": tf.io.RaggedFeature(tf.float32),
+}
+# All spec variants, built once at import time and shared (read-only) across
+# decoder instances, keyed by (include_mask, activate_pseudo_score).
+_KEYS_TO_FEATURES_VARIANTS = {
+    (include_mask, pseudo_score): {
+        **_BASE_KEYS_TO_FEATURES,
+        **(_MASK_FEATURES if include_mask else {}),
+        **(_PSEUDO_SCORE_FEATURES if pseudo_score else {}),
+    }
+    for include_mask in (False, True)
+    for pseudo_score in (False, True)
+}
 
 
 class TfExampleDecoder(object):
@@ -42,39 +83,92 @@ class TfExampleDecoder(object):
         include_mask=False,
         regenerate_source_id=False,
         activate_pseudo_score=False,
+        image_format="auto",
+        include_box_coordinate_lists=False,
+        masks_always_empty=False,
     ):
+        if image_format not in ("auto", "jpeg", "png"):
+            raise ValueError("Unsupported image_format: %s" % image_format)
         self._include_mask = include_mask
+        self._masks_always_empty = masks_always_empty
+        self._include_box_coordinate_lists = include_box_coordinate_lists
         self._regenerate_source_id = regenerate_source_id
-        self._keys_to_features = {
-            "image/encoded": tf.io.FixedLenFeature((), tf.string),
-            "image/source_id": tf.io.FixedLenFeature((), tf.string, ""),
-            "image/height": tf.io.FixedLenFeature((), tf.int64, -1),
-            "image/width": tf.io.FixedLenFeature((), tf.int64, -1),
-            "image/object/bbox/xmin": tf.io.VarLenFeature(tf.float32),
-            "image/object/bbox/xmax": tf.io.VarLenFeature(tf.float32),
-            "image/object/bbox/ymin": tf.io.VarLenFeature(tf.float32),
-            "image/object/bbox/ymax": tf.io.VarLenFeature(tf.float32),
-            "image/object/class/label": tf.io.VarLenFeature(tf.int64),
-            "image/object/area": tf.io.VarLenFeature(tf.float32),
-            "image/object/is_crowd": tf.io.VarLenFeature(tf.int64),
-        }
+        self._image_format = image_format
         self.activate_pseudo_score = activate_pseudo_score
-        if self.activate_pseudo_score:
-            self._keys_to_features["image/object/pseudo_score"] = tf.io.VarLenFeature(
-                tf.float32
+        # Shared precomputed spec; must not be mutated by instances.
+        self._keys_to_features = _KEYS_TO_FEATURES_VARIANTS[
+            (bool(include_mask), bool(activate_pseudo_score))
+        ]
+        # Static lists of VarLen keys, enumerated once here so the decode
+        # paths densify without isinstance reflection at trace time. Empty for
+        # the stock RaggedFeature spec, but kept so feature specs that still
+        # register VarLenFeature entries keep working.
+        self._sparse_string_keys = tuple(
+            k
+            for k, v in self._keys_to_features.items()
+            if isinstance(v, tf.io.VarLenFeature) and v.dtype == tf.string
+        )
+        self._sparse_numeric_keys = tuple(
+            k
+            for k, v in self._keys_to_features.items()
+            if isinstance(v, tf.io.VarLenFeature) and v.dtype != tf.string
+        )
+
+    def _decode_image(self, parsed_tensors):
+        """Decodes the image and set its static shape.
+
+        With image_format 'jpeg' or 'png' the matching decoder is called
+        directly, skipping decode_image's runtime format probe; INTEGER_FAST
+        trades marginal decode quality for noticeably faster JPEG decoding.
+        """
+        if self._image_format == "jpeg":
+            image = tf.io.decode_jpeg(
+                parsed_tensors["image/encoded"], channels=3, dct_method="INTEGER_FAST"
             )
-        if include_mask:
-            self._keys_to_features.update(
-                {
-                    "image/object/mask": tf.io.VarLenFeature(tf.string),
-                }
+        elif self._image_format == "png":
+            image = tf.io.decode_png(parsed_tensors["image/encoded"], channels=3)
+        else:
+            image = tf.io.decode_image(
+                parsed_tensors["image/encoded"], channels=3, expand_animations=False
             )
+        image.set_shape([None, None, 3])
+        return image
 
-    def _decode_image(self, parsed_tensors):
-        """Decodes the image and set its static shape."""
-        return tf.io.decode_image(
-            parsed_tensors["image/encoded"], channels=3, expand_animations=False
+    def _decode_image_with_window(self, parsed_tensors, crop_window, ratio=1):
+        """Decodes the image fused with a crop to [y, x, height, width].
+
+        For JPEG inputs, tf.image.decode_and_crop_jpeg runs the IDCT only on
+        the MCUs covered by the crop window, skipping most of the decode work
+        and the full-resolution intermediate tensor. `ratio` additionally
+        downscales by 2, 4 or 8 during the JPEG decode and is ignored for
+        other formats, which are fully decoded and then cropped.
+        """
+        encoded = parsed_tensors["image/encoded"]
+        crop_window = tf.cast(crop_window, dtype=tf.int32)
+
+        def _decode_and_crop_jpeg():
+            return tf.image.decode_and_crop_jpeg(
+                encoded,
+                crop_window,
+                channels=3,
+                ratio=ratio,
+                dct_method="INTEGER_FAST",
+            )
+
+        def _decode_then_crop():
+            return tf.image.crop_to_bounding_box(
+                self._decode_image(parsed_tensors),
+                crop_window[0],
+                crop_window[1],
+                crop_window[2],
+                crop_window[3],
+            )
+
+        image = tf.cond(
+            tf.io.is_jpeg(encoded), _decode_and_crop_jpeg, _decode_then_crop
         )
+        image.set_shape([None, None, 3])
+        return image
 
     def _decode_boxes(self, parsed_tensors):
         """Concat box coordinates in the format of [ymin, xmin, ymax, xmax]."""
@@ -84,8 +178,18 @@ class TfExampleDecoder(object):
         ymax = parsed_tensors["image/object/bbox/ymax"]
         return tf.stack([ymin, xmin, ymax, xmax], axis=-1)
 
-    def _decode_masks(self, parsed_tensors):
-        """Decode a set of PNG masks to the tf.float32 tensors."""
+    def _decode_masks(self, parsed_tensors, height, width):
+        """Decode a set of PNG masks to the tf.float32 tensors.
+
+        `height` and `width` are the already-resolved image dimensions,
+        threaded in by the caller so the empty fallback reuses them instead of
+        re-reading the parsed tensors.
+        """
+        # Trace-time short-circuit: datasets known to carry no masks (via the
+        # masks_always_empty flag, or records written without the mask key)
+        # prune the PNG decode branch from the graph entirely.
+        if self._masks_always_empty or "image/object/mask" not in parsed_tensors:
+            return tf.zeros([0, height, width], dtype=tf.float32)
 
         def _decode_png_mask(png_bytes):
             mask = tf.squeeze(
@@ -95,26 +199,41 @@ class TfExampleDecoder(object):
             mask.set_shape([None, None])
             return mask
 
-        height = parsed_tensors["image/height"]
-        width = parsed_tensors["image/width"]
         masks = parsed_tensors["image/object/mask"]
+        # vectorized_map avoids map_fn's TensorArray overhead; decode_png is
+        # not pfor-convertible, so it transparently falls back to a while loop.
         return tf.cond(
             tf.greater(tf.shape(masks)[0], 0),
-            lambda: tf.map_fn(_decode_png_mask, masks, dtype=tf.float32),
+            lambda: tf.vectorized_map(
+                _decode_png_mask, masks, fallback_to_while_loop=True
+            ),
             lambda: tf.zeros([0, height, width], dtype=tf.float32),
         )
 
-    def _decode_areas(self, parsed_tensors):
-        xmin = parsed_tensors["image/object/bbox/xmin"]
-        xmax = parsed_tensors["image/object/bbox/xmax"]
-        ymin = parsed_tensors["image/object/bbox/ymin"]
-        ymax = parsed_tensors["image/object/bbox/ymax"]
-        return tf.cond(
-            tf.greater(tf.shape(parsed_tensors["image/object/area"])[0], 0),
-            lambda: parsed_tensors["image/object/area"],
-            lambda: (xmax - xmin) * (ymax - ymin),
-        )
+    def _decode_areas(self, parsed_tensors, boxes):
+        """Gets areas from the example, falling back to the box areas."""
+        area = parsed_tensors["image/object/area"]
+        # Branchless fallback: compute the box areas unconditionally, pad the
+        # (possibly empty) stored areas to the same length and select with a
+        # scalar mask. Avoids the Switch/Merge pair a tf.cond would emit. The
+        # fallback is sliced out of the already-stacked [N, 4] boxes so the
+        # parsed coordinate tensors are only read once.
+        computed_area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        has_area = tf.greater(tf.size(area), 0)
+        area = tf.pad(area, [[0, tf.shape(computed_area)[0] - tf.shape(area)[0]]])
+        return tf.where(has_area, area, computed_area)
 
+    def _decode_is_crowds(self, parsed_tensors):
+        """Pads is_crowd to the label length; missing entries become False."""
+        labels = parsed_tensors["image/object/class/label"]
+        is_crowd = parsed_tensors["image/object/is_crowd"]
+        pad = tf.shape(labels)[0] - tf.shape(is_crowd)[0]
+        return tf.cast(tf.pad(is_crowd, [[0, pad]]), dtype=tf.bool)
+
+    # Traced once per decoder thanks to the fixed signature; jit_compile is
+    # deliberately off since decode_image/decode_png have no XLA kernels and
+    # every per-object field is dynamically shaped.
+    @tf.function(input_signature=[tf.TensorSpec([], tf.string)])
     def decode(self, serialized_example):
         """Decode the serialized example.
 
@@ -135,66 +254,102 @@ class TfExampleDecoder(object):
                 [None, None, None].
             - groundtruth_instance_masks_png: a string tensor of shape [None].
             - groundtruth_pseudo_score: a float32 tensor of shape [None]. Optional for pseudo-labels.
+            - groundtruth_boxes_{ymin,xmin,ymax,xmax}: float32 tensors of
+                shape [None]. Optional contiguous per-coordinate views,
+                emitted when include_box_coordinate_lists is set.
         """
-        parsed_tensors = tf.io.parse_single_example(
-            serialized_example, self._keys_to_features
-        )
-        for k in parsed_tensors:
-            if isinstance(parsed_tensors[k], tf.SparseTensor):
-                if parsed_tensors[k].dtype == tf.string:
-                    parsed_tensors[k] = tf.sparse.to_dense(
-                        parsed_tensors[k], default_value=""
-                    )
-                else:
-                    parsed_tensors[k] = tf.sparse.to_dense(
-                        parsed_tensors[k], default_value=0
-                    )
+        # parse_single_example is parse_example on a batch of one plus a
+        # squeeze, so call parse_example directly and strip the unit batch
+        # dimension here: the rows of a one-batch RaggedTensor are exactly its
+        # values, dense outputs lose the leading axis, and any remaining
+        # sparse output (VarLenFeature keys precomputed in __init__) is
+        # flattened for the densify step below.
+        parsed_tensors = tf.io.parse_example(
+            tf.expand_dims(serialized_example, axis=0), self._keys_to_features
+        )
+        parsed_tensors = {
+            k: v.values
+            if isinstance(v, tf.RaggedTensor)
+            else (
+                tf.sparse.reshape(v, [-1])
+                if isinstance(v, tf.SparseTensor)
+                else tf.squeeze(v, axis=0)
+            )
+            for k, v in parsed_tensors.items()
+        }
+        for k in self._sparse_string_keys:
+            parsed_tensors[k] = tf.sparse.to_dense(parsed_tensors[k], default_value="")
+        for k in self._sparse_numeric_keys:
+            parsed_tensors[k] = tf.sparse.to_dense(parsed_tensors[k], default_value=0)
 
         image = self._decode_image(parsed_tensors)
         boxes = self._decode_boxes(parsed_tensors)
-        areas = self._decode_areas(parsed_tensors)
+        areas = self._decode_areas(parsed_tensors, boxes)
 
         decode_image_shape = tf.logical_or(
             tf.equal(parsed_tensors["image/height"], -1),
             tf.equal(parsed_tensors["image/width"], -1),
         )
-        image_shape = tf.cast(tf.shape(image), dtype=tf.int64)
+        image_shape = tf.shape(image, out_type=tf.int64)
 
-        parsed_tensors["image/height"] = tf.where(
+        height = tf.where(
             decode_image_shape, image_shape[0], parsed_tensors["image/height"]
         )
-        parsed_tensors["image/width"] = tf.where(
+        width = tf.where(
             decode_image_shape, image_shape[1], parsed_tensors["image/width"]
         )
 
-        is_crowds = tf.cond(
-            tf.greater(tf.shape(parsed_tensors["image/object/is_crowd"])[0], 0),
-            lambda: tf.cast(parsed_tensors["image/object/is_crowd"], dtype=tf.bool),
-            lambda: tf.zeros_like(
-                parsed_tensors["image/object/class/label"], dtype=tf.bool
-            ),
-        )  # pylint: disable=line-too-long
-        if self._regenerate_source_id:
-            source_id = _get_source_id_from_encoded_image(parsed_tensors)
-        else:
-            source_id = tf.cond(
-                tf.greater(tf.strings.length(parsed_tensors["image/source_id"]), 0),
-                lambda: parsed_tensors["image/source_id"],
-                lambda: _get_source_id_from_encoded_image(parsed_tensors),
+        is_crowds = self._decode_is_crowds(parsed_tensors)
+        # source_id reads only image/source_id and image/encoded; build it as
+        # one branchless select so the executor can schedule it independently
+        # of the box/area/crowd tensors. The regenerate flag enters the graph
+        # as a constant that folds away, and the hash input collapses to an
+        # empty string whenever the parsed id is kept, so the encoded image
+        # bytes are only hashed when the fallback is actually selected.
+        keep_parsed_id = tf.logical_and(
+            tf.constant(not self._regenerate_source_id),
+            tf.greater(tf.strings.length(parsed_tensors["image/source_id"]), 0),
+        )
+        hashed_id = tf.strings.as_string(
+            _get_source_id_from_encoded_image(
+                tf.where(keep_parsed_id, "", parsed_tensors["image/encoded"])
             )
+        )
+        source_id = tf.where(
+            keep_parsed_id, parsed_tensors["image/source_id"], hashed_id
+        )
         if self._include_mask:
-            masks = self._decode_masks(parsed_tensors)
+            masks = self._decode_masks(parsed_tensors, height, width)
 
         decoded_tensors = {
             "image": image,
             "source_id": source_id,
-            "height": parsed_tensors["image/height"],
-            "width": parsed_tensors["image/width"],
+            "height": height,
+            "width": width,
             "groundtruth_classes": parsed_tensors["image/object/class/label"],
             "groundtruth_is_crowd": is_crowds,
             "groundtruth_area": areas,
             "groundtruth_boxes": boxes,
         }
+        if self._include_box_coordinate_lists:
+            # SoA view of the boxes: each coordinate as a contiguous vector
+            # for column-access consumers, next to the stacked [N, 4] form.
+            decoded_tensors.update(
+                {
+                    "groundtruth_boxes_ymin": parsed_tensors[
+                        "image/object/bbox/ymin"
+                    ],
+                    "groundtruth_boxes_xmin": parsed_tensors[
+                        "image/object/bbox/xmin"
+                    ],
+                    "groundtruth_boxes_ymax": parsed_tensors[
+                        "image/object/bbox/ymax"
+                    ],
+                    "groundtruth_boxes_xmax": parsed_tensors[
+                        "image/object/bbox/xmax"
+                    ],
+                }
+            )
         if self.activate_pseudo_score:
             decoded_tensors["groundtruth_pseudo_score"] = parsed_tensors[
                 "image/object/pseudo_score"
@@ -209,3 +364,248 @@ class TfExampleDecoder(object):
                 }
             )
         return decoded_tensors
+
+    def as_map_fn(self):
+        """Returns decode() for use as a tf.data map function.
+
+        The recommended call trades output ordering for throughput, letting
+        fast examples overtake slow ones (PNG mask decode cost varies widely
+        between examples):
+
+          dataset.map(decoder.as_map_fn(),
+                      num_parallel_calls=tf.data.AUTOTUNE,
+                      deterministic=False).prefetch(tf.data.AUTOTUNE)
+        """
+        # decode() is already a tf.function with a fixed input signature.
+        return self.decode
+
+    def apply(self, dataset, batch_size=None, batch_before_parse=True):
+        """Applies the recommended decode stage to a serialized-example dataset.
+
+        With `batch_size` set and `batch_before_parse` True (default), the raw
+        strings are batched first and parsed with one decode_batch call per
+        batch. With `batch_before_parse` False, decode() is mapped per example
+        and the outputs are batched with dense_to_ragged_batch, which keeps
+        the variable-length fields ragged with int32 row splits instead of
+        padding every example to the batch maximum. Without `batch_size`,
+        decode() is mapped per example. All variants use AUTOTUNE parallelism
+        with non-deterministic ordering and prefetch the decoded tensors.
+        """
+        batch_first = bool(batch_size) and batch_before_parse
+        if batch_first:
+            dataset = dataset.batch(batch_size)
+        dataset = dataset.map(
+            self.decode_batch if batch_first else self.decode,
+            num_parallel_calls=tf.data.AUTOTUNE,
+            deterministic=False,
+        )
+        if batch_size and not batch_first:
+            dataset = dataset.apply(
+                tf.data.experimental.dense_to_ragged_batch(batch_size)
+            )
+        return dataset.prefetch(tf.data.AUTOTUNE)
+
+    def decode_batch(self, serialized_examples):
+        """Decode a batch of serialized examples with one parse_example call.
+
+        Parsing the batched string tensor amortizes op-dispatch overhead across
+        the batch and keeps variable-length fields ragged instead of padded.
+        Intended usage is `dataset.batch(N).map(decoder.decode_batch)` instead
+        of `dataset.map(decoder.decode).batch(N)`. All images in the batch must
+        share the same spatial shape since they are stacked after decoding.
+        Instance masks are not decoded here; with `include_mask` the PNG
+        strings are returned ragged.
+
+        Args:
+          serialized_examples: a [batch_size] string tensor of serialized
+            tf.Example protos.
+
+        Returns:
+          decoded_tensors: a dictionary with the same keys as `decode()`, where
+            the per-object fields are tf.RaggedTensors with a leading batch
+            dimension.
+        """
+        parsed_tensors = tf.io.parse_example(
+            serialized_examples, self._keys_to_features
+        )
+        for k in self._sparse_string_keys + self._sparse_numeric_keys:
+            parsed_tensors[k] = tf.RaggedTensor.from_sparse(parsed_tensors[k])
+
+        images = tf.map_fn(
+            lambda encoded: self._decode_image({"image/encoded": encoded}),
+            parsed_tensors["image/encoded"],
+            fn_output_signature=tf.uint8,
+        )
+
+        xmin = parsed_tensors["image/object/bbox/xmin"]
+        xmax = parsed_tensors["image/object/bbox/xmax"]
+        ymin = parsed_tensors["image/object/bbox/ymin"]
+        ymax = parsed_tensors["image/object/bbox/ymax"]
+        boxes = tf.stack([ymin, xmin, ymax, xmax], axis=-1)
+
+        # Per-example area fallback without a loop: stored areas align with the
+        # box rows of their example, so scatter them over the computed areas at
+        # the value positions belonging to examples that carry areas.
+        computed_area = (xmax - xmin) * (ymax - ymin)
+        area = parsed_tensors["image/object/area"]
+        use_stored_area = tf.gather(
+            tf.greater(area.row_lengths(), 0), computed_area.value_rowids()
+        )
+        areas = computed_area.with_values(
+            tf.tensor_scatter_nd_update(
+                computed_area.values, tf.where(use_stored_area), area.values
+            )
+        )
+
+        labels = parsed_tensors["image/object/class/label"]
+        is_crowd = parsed_tensors["image/object/is_crowd"]
+        use_stored_crowd = tf.gather(
+            tf.greater(is_crowd.row_lengths(), 0), labels.value_rowids()
+        )
+        is_crowds = labels.with_values(
+            tf.cast(
+                tf.tensor_scatter_nd_update(
+                    tf.zeros_like(labels.values),
+                    tf.where(use_stored_crowd),
+                    is_crowd.values,
+                ),
+                dtype=tf.bool,
+            )
+        )
+
+        image_shape = tf.shape(images, out_type=tf.int64)
+        decode_image_shape = tf.logical_or(
+            tf.equal(parsed_tensors["image/height"], -1),
+            tf.equal(parsed_tensors["image/width"], -1),
+        )
+        heights = tf.where(
+            decode_image_shape, image_shape[1], parsed_tensors["image/height"]
+        )
+        widths = tf.where(
+            decode_image_shape, image_shape[2], parsed_tensors["image/width"]
+        )
+
+        # Same branchless source_id select as decode(), elementwise over the
+        # batch; encoded bytes are only hashed where the fallback is taken.
+        keep_parsed_id = tf.logical_and(
+            tf.constant(not self._regenerate_source_id),
+            tf.greater(tf.strings.length(parsed_tensors["image/source_id"]), 0),
+        )
+        hashed_id = tf.strings.as_string(
+            _get_source_id_from_encoded_image(
+                tf.where(keep_parsed_id, "", parsed_tensors["image/encoded"])
+            )
+        )
+        source_id = tf.where(
+            keep_parsed_id, parsed_tensors["image/source_id"], hashed_id
+        )
+
+        decoded_tensors = {
+            "image": images,
+            "source_id": source_id,
+            "height": heights,
+            "width": widths,
+            "groundtruth_classes": labels,
+            "groundtruth_is_crowd": is_crowds,
+            "groundtruth_area": areas,
+            "groundtruth_boxes": boxes,
+        }
+        if self._include_box_coordinate_lists:
+            decoded_tensors.update(
+                {
+                    "groundtruth_boxes_ymin": ymin,
+                    "groundtruth_boxes_xmin": xmin,
+                    "groundtruth_boxes_ymax": ymax,
+                    "groundtruth_boxes_xmax": xmax,
+                }
+            )
+        if self.activate_pseudo_score:
+            decoded_tensors["groundtruth_pseudo_score"] = parsed_tensors[
+                "image/object/pseudo_score"
+            ]
+        if self._include_mask:
+            decoded_tensors["groundtruth_instance_masks_png"] = parsed_tensors[
+                "image/object/mask"
+            ]
+        return decoded_tensors
+
+    def decode_fixed_batch(self, serialized_examples):
+        """Decodes only the fixed-length fields of a batch via decode_proto.
+
+        Runs the protobuf parser kernel directly over the whole batch, which
+        is cheaper than parse_example when only the FixedLen fields are needed
+        (e.g. id or shape scans over large record sets). The variable-length
+        object fields are not extracted; use decode_batch for those.
+
+        Args:
+          serialized_examples: a [batch_size] string tensor of serialized
+            tf.Example protos.
+
+        Returns:
+          A dictionary with [batch_size] tensors for 'image/encoded',
+          'image/source_id', 'image/height' and 'image/width'; missing fields
+          get the same defaults as the parse spec ('' and -1).
+        """
+
+        def _single_field(message_bytes, message_type, field_name, dtype, default):
+            # decode_proto emits [batch, max_count] values plus per-example
+            # counts; take the first value and fall back to `default` where
+            # the field is absent. Padding one default column keeps the
+            # indexing valid when the field is absent batch-wide.
+            sizes, [values] = tf.io.decode_proto(
+                message_bytes, message_type, [field_name], [dtype]
+            )
+            values = tf.pad(values, [[0, 0], [0, 1]], constant_values=default)
+            return tf.where(tf.greater(sizes[:, 0], 0), values[:, 0], default)
+
+        features = _single_field(
+            serialized_examples, "tensorflow.Example", "features", tf.string, ""
+        )
+        # The feature map arrives as repeated serialized map entries in
+        # arbitrary per-example order, so entries are flattened and matched to
+        # their example by row id.
+        entry_sizes, [entries] = tf.io.decode_proto(
+            features, "tensorflow.Features", ["feature"], [tf.string]
+        )
+        entries = tf.RaggedTensor.from_tensor(
+            entries, lengths=tf.cast(entry_sizes[:, 0], tf.int64)
+        )
+        example_ids = entries.value_rowids()
+        keys = _single_field(
+            entries.values, "tensorflow.Features.FeatureEntry", "key", tf.string, ""
+        )
+        feature_protos = _single_field(
+            entries.values, "tensorflow.Features.FeatureEntry", "value", tf.string, ""
+        )
+        batch_size = tf.shape(serialized_examples)[0]
+
+        def _select_feature(key):
+            mask = tf.equal(keys, key)
+            return tf.tensor_scatter_nd_update(
+                tf.fill([batch_size], ""),
+                tf.expand_dims(tf.boolean_mask(example_ids, mask), axis=-1),
+                tf.boolean_mask(feature_protos, mask),
+            )
+
+        def _bytes_feature(key, default):
+            bytes_lists = _single_field(
+                _select_feature(key), "tensorflow.Feature", "bytes_list", tf.string, ""
+            )
+            return _single_field(
+                bytes_lists, "tensorflow.BytesList", "value", tf.string, default
+            )
+
+        def _int64_feature(key, default):
+            int64_lists = _single_field(
+                _select_feature(key), "tensorflow.Feature", "int64_list", tf.string, ""
+            )
+            return _single_field(
+                int64_lists, "tensorflow.Int64List", "value", tf.int64, default
+            )
+
+        return {
+            "image/encoded": _bytes_feature("image/encoded", ""),
+            "image/source_id": _bytes_feature("image/source_id", ""),
+            "image/height": _int64_feature("image/height", -1),
+            "image/width": _int64_feature("image/width", -1),
+        }